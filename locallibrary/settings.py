@@ -82,6 +82,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        #no tests use serialized_rollback, so skip serializing the test db at setup
+        'TEST': {'SERIALIZE': False},
     }
 }
 